@@ -46,8 +46,12 @@ setup(
         'pyxdg',
         'requests',
     ],
+    extras_require={
+        'orjson': ['orjson'],
+        'requests-cache': ['requests-cache'],
+    },
+    tests_require=['pytest', 'pytest-xdist'],
     entry_points={
         'console_scripts': ['uplink=uplink.uplink_cli:uplink'],
     },
-    test_suite='tests',
 )
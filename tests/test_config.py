@@ -1,7 +1,9 @@
 # coding=utf-8
 """Unit tests for :mod:`uplink.config`."""
+import ast
 import builtins
-import itertools
+import copy
+import io
 import json
 import os
 import random
@@ -48,6 +50,11 @@ UPLINK_CONFIG = """
 }
 """
 
+# Tests which mutate the parsed config must work on a deep copy of this.
+UPLINK_CONFIG_DICT = json.loads(UPLINK_CONFIG)
+
+_UPLINK_CONFIG_BYTES = UPLINK_CONFIG.encode()
+
 
 OLD_CONFIG = """
 {
@@ -96,6 +103,15 @@ def _gen_attrs():
     }
 
 
+def _open_config(*args, **kwargs):  # pylint:disable=unused-argument
+    """Stand in for ``open`` and return a file-like object of UPLINK_CONFIG."""
+    return io.BytesIO(_UPLINK_CONFIG_BYTES)
+
+
+# Generated once and shared by several test cases, which must not mutate it.
+_GEN_ATTRS_CACHED = _gen_attrs()
+
+
 class GetConfigTestCase(unittest.TestCase):
     """Test :func:`uplink.config.get_config`."""
 
@@ -119,12 +135,11 @@ class ValidateConfigTestCase(unittest.TestCase):
 
     def test_valid_config(self):
         """A valid config does not raise an exception."""
-        self.assertIsNone(
-            config.validate_config(json.loads(UPLINK_CONFIG)))
+        self.assertIsNone(config.validate_config(UPLINK_CONFIG_DICT))
 
     def test_invalid_config(self):
         """An invalid config raises an exception."""
-        config_dict = json.loads(UPLINK_CONFIG)
+        config_dict = copy.deepcopy(UPLINK_CONFIG_DICT)
         config_dict['pulp']['auth'] = []
         config_dict['systems'][0]['hostname'] = ''
         with self.assertRaises(exceptions.ConfigValidationError) as err:
@@ -138,7 +153,7 @@ class ValidateConfigTestCase(unittest.TestCase):
 
     def test_config_missing_roles(self):
         """Missing required roles in config raises an exception."""
-        config_dict = json.loads(UPLINK_CONFIG)
+        config_dict = copy.deepcopy(UPLINK_CONFIG_DICT)
         for system in config_dict['systems']:
             system['roles'].pop('api', None)
             system['roles'].pop('pulp workers', None)
@@ -149,6 +164,53 @@ class ValidateConfigTestCase(unittest.TestCase):
             ['The following roles are missing: api, pulp workers']
         )
 
+    def test_cache_hit(self):
+        """A config is not validated again once it has passed validation."""
+        config.validate_config(UPLINK_CONFIG_DICT)
+        with mock.patch.object(config, '_VALIDATOR') as validator:
+            config.validate_config(UPLINK_CONFIG_DICT)
+        self.assertEqual(validator.iter_errors.call_count, 0)
+
+    def test_cache_keeps_types(self):
+        """A cached config does not let an equal config of other types pass."""
+        config.validate_config(UPLINK_CONFIG_DICT)
+        config_dict = copy.deepcopy(UPLINK_CONFIG_DICT)
+        config_dict['pulp']['auth'] = tuple(config_dict['pulp']['auth'])
+        with self.assertRaises(exceptions.ConfigValidationError):
+            config.validate_config(config_dict)
+
+
+class PulpSystemTestCase(unittest.TestCase):
+    """Test :class:`uplink.config.PulpSystem`."""
+
+    def test_hash(self):
+        """Equal systems have equal hashes."""
+        systems = [
+            config.PulpSystem(
+                hostname='pulp.example.com',
+                roles={'api': {'scheme': 'https'}, 'shell': {}},
+            )
+            for _ in range(2)
+        ]
+        self.assertIsNot(systems[0], systems[1])
+        self.assertEqual(hash(systems[0]), hash(systems[1]))
+        self.assertEqual(len(set(systems)), 1)
+
+
+class JsonDumpsTestCase(unittest.TestCase):
+    """Test ``uplink.config._json_dumps``."""
+
+    @unittest.skipIf(config.orjson is None, 'orjson is not installed')
+    def test_same_output(self):
+        """orjson and the json fallback produce the same bytes."""
+        obj = {'pulp': {'auth': ['admin', 's\u00e9cret'], 'version': '2.13'}}
+        # pylint:disable=protected-access
+        with_orjson = config._json_dumps(obj)
+        with mock.patch.object(config, 'orjson', None):
+            with_json = config._json_dumps(obj)
+        self.assertEqual(with_orjson, with_json)
+        self.assertIn('s\u00e9cret'.encode('utf-8'), with_json)
+
 
 class InitTestCase(unittest.TestCase):
     """Test :class:`uplink.config.UplinkConfig` instantiation."""
@@ -156,7 +218,7 @@ class InitTestCase(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """Generate some attributes and use them to instantiate a config."""
-        cls.kwargs = _gen_attrs()
+        cls.kwargs = _GEN_ATTRS_CACHED
         cls.cfg = config.UplinkConfig(**cls.kwargs)
 
     def test_public_attrs(self):
@@ -198,8 +260,7 @@ class ReadTestCase(unittest.TestCase):
 
     def test_read_config_file(self):
         """Ensure Pulp Smash can read the config file."""
-        open_ = mock.mock_open(read_data=UPLINK_CONFIG)
-        with mock.patch.object(builtins, 'open', open_):
+        with mock.patch.object(builtins, 'open', side_effect=_open_config):
             with mock.patch.object(config, '_get_config_file_path'):
                 cfg = config.UplinkConfig().read()
         with self.subTest('check pulp_auth'):
@@ -207,9 +268,9 @@ class ReadTestCase(unittest.TestCase):
         with self.subTest('check pulp_version'):
             self.assertEqual(cfg.pulp_version, config.Version('2.12.1'))
         with self.subTest('check systems'):
-            self.assertEqual(
-                sorted(cfg.systems),
-                sorted([
+            self.assertCountEqual(
+                cfg.systems,
+                [
                     config.PulpSystem(
                         hostname='first.example.com',
                         roles={
@@ -241,19 +302,19 @@ class ReadTestCase(unittest.TestCase):
                             'squid': {}
                         }
                     ),
-                ])
+                ]
             )
 
 
 class HelperMethodsTestCase(unittest.TestCase):
     """Test :meth:`uplink.config.UplinkConfig` helper methods."""
 
-    def setUp(self):
-        """Generate contents for a configuration file."""
-        open_ = mock.mock_open(read_data=UPLINK_CONFIG)
-        with mock.patch.object(builtins, 'open', open_):
+    @classmethod
+    def setUpClass(cls):
+        """Read a config shared by all tests, which must not mutate it."""
+        with mock.patch.object(builtins, 'open', side_effect=_open_config):
             with mock.patch.object(config, '_get_config_file_path'):
-                self.cfg = config.UplinkConfig().read()
+                cls.cfg = config.UplinkConfig().read()
 
     def test_get_systems(self):
         """``get_systems`` returns proper result."""
@@ -261,18 +322,33 @@ class HelperMethodsTestCase(unittest.TestCase):
             result = [
                 system.hostname for system in self.cfg.get_systems('api')]
             self.assertEqual(len(result), 2)
-            self.assertEqual(
-                sorted(result),
-                sorted(['first.example.com', 'second.example.com'])
-            )
+            self.assertCountEqual(
+                result, ['first.example.com', 'second.example.com'])
         with self.subTest('role with single match system'):
             result = [
                 system.hostname for system in self.cfg.get_systems('mongod')]
             self.assertEqual(len(result), 1)
-            self.assertEqual(
-                sorted(result),
-                sorted(['first.example.com'])
-            )
+            self.assertEqual(result, ['first.example.com'])
+
+    def test_get_systems_reassigned(self):
+        """``get_systems`` reflects a newly assigned list of systems."""
+        cfg = copy.deepcopy(self.cfg)
+        self.assertEqual(len(cfg.get_systems('mongod')), 1)
+        cfg.systems = [
+            system for system in cfg.systems if 'mongod' not in system.roles]
+        self.assertEqual(cfg.get_systems('mongod'), [])
+
+    def test_get_systems_appended(self):
+        """``get_systems`` reflects systems appended in place."""
+        cfg = config.UplinkConfig()
+        self.assertEqual(cfg.get_systems('api'), [])
+        system = config.PulpSystem(
+            hostname='pulp.example.com',
+            roles={'api': {'scheme': 'https'}, 'shell': {}},
+        )
+        cfg.systems.append(system)
+        self.assertEqual(cfg.get_systems('api'), [system])
+        self.assertEqual(cfg.base_url, 'https://pulp.example.com/')
 
     def test_services_for_roles(self):
         """``services_for_roles`` returns proper result."""
@@ -310,7 +386,7 @@ class GetRequestsKwargsTestCase(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """Create a mock server config and call the method under test."""
-        cls.attrs = _gen_attrs()
+        cls.attrs = _GEN_ATTRS_CACHED
         cls.cfg = config.UplinkConfig(**cls.attrs)
         cls.kwargs = cls.cfg.get_requests_kwargs()
 
@@ -340,22 +416,25 @@ class ReprTestCase(unittest.TestCase):
     @classmethod
     def setUpClass(cls):
         """Generate attributes and call the method under test."""
-        cls.attrs = _gen_attrs()
+        cls.attrs = _GEN_ATTRS_CACHED
         cls.cfg = config.UplinkConfig(**cls.attrs)
         cls.result = repr(cls.cfg)
 
     def test_is_sane(self):
-        """Assert that the result is in an expected set of results."""
-        # permutations() → (((k1, v1), (k2, v2)), ((k2, v2), (k1, v1)))
-        # kwargs_iter = ('k1=v1, k2=v2', 'k2=v2, k1=v1)
-        kwargs_iter = (
-            ', '.join(key + '=' + repr(val) for key, val in two_tuples)
-            for two_tuples in itertools.permutations(self.attrs.items())
-        )
-        targets = tuple(
-            'UplinkConfig({})'.format(arglist) for arglist in kwargs_iter
-        )
-        self.assertIn(self.result, targets)
+        """Assert that the result is a call with the expected kwargs."""
+        call = ast.parse(self.result, mode='eval').body
+        self.assertEqual(call.func.id, 'UplinkConfig')
+        self.assertEqual(call.args, [])
+        # Evaluate each value on its own, so kwargs may come in any order.
+        namespace = {'PulpSystem': config.PulpSystem}
+        kwargs = {
+            keyword.arg: eval(  # pylint:disable=eval-used
+                compile(ast.Expression(keyword.value), '<repr>', 'eval'),
+                namespace,
+            )
+            for keyword in call.keywords
+        }
+        self.assertEqual(kwargs, self.attrs)
 
     def test_can_eval(self):
         """Assert that the result can be parsed by ``eval``."""
@@ -370,36 +449,56 @@ class ReprTestCase(unittest.TestCase):
             self.assertEqual(cfg.systems, self.cfg.systems)
 
 
+# `GetConfigFilePathTestCase` searches these instead of the real XDG config
+# directories.
+_XDG_CONFIG_DIRS = ['an_iterable', 'of_xdg', 'config_paths']
+
+
 class GetConfigFilePathTestCase(unittest.TestCase):
     """Test ``uplink.config._get_config_file_path``."""
 
     def test_success(self):
         """Assert the method returns a path when a config file is found."""
-        with mock.patch.object(xdg.BaseDirectory, 'load_config_paths') as lcp:
-            lcp.return_value = ('an_iterable', 'of_xdg', 'config_paths')
+        args = (utils.uuid4(), utils.uuid4())
+        with mock.patch.object(
+                xdg.BaseDirectory, 'xdg_config_dirs', _XDG_CONFIG_DIRS):
+            with mock.patch.object(os.path, 'isfile') as isfile:
+                isfile.side_effect = (False, True)
+                # pylint:disable=protected-access
+                path = config._get_config_file_path(*args)
+        self.assertEqual(path, os.path.join(_XDG_CONFIG_DIRS[1], *args))
+        self.assertEqual(isfile.call_count, 2)
+
+    def test_cached(self):
+        """Assert the method does not search again for a found config file."""
+        args = (utils.uuid4(), utils.uuid4())
+        with mock.patch.object(
+                xdg.BaseDirectory, 'xdg_config_dirs', _XDG_CONFIG_DIRS):
             with mock.patch.object(os.path, 'isfile') as isfile:
                 isfile.return_value = True
                 # pylint:disable=protected-access
-                config._get_config_file_path(utils.uuid4(), utils.uuid4())
-        self.assertGreater(isfile.call_count, 0)
+                path = config._get_config_file_path(*args)
+                isfile.reset_mock()
+                self.assertEqual(config._get_config_file_path(*args), path)
+        self.assertEqual(path, os.path.join(_XDG_CONFIG_DIRS[0], *args))
+        self.assertEqual(isfile.call_count, 0)
 
     def test_failures(self):
         """Assert the  method raises an exception when no config is found."""
-        with mock.patch.object(xdg.BaseDirectory, 'load_config_paths') as lcp:
-            lcp.return_value = ('an_iterable', 'of_xdg', 'config_paths')
+        with mock.patch.object(
+                xdg.BaseDirectory, 'xdg_config_dirs', _XDG_CONFIG_DIRS):
             with mock.patch.object(os.path, 'isfile') as isfile:
                 isfile.return_value = False
                 with self.assertRaises(exceptions.ConfigFileNotFoundError):
                     # pylint:disable=protected-access
                     config._get_config_file_path(utils.uuid4(), utils.uuid4())
-        self.assertGreater(isfile.call_count, 0)
+        self.assertEqual(isfile.call_count, len(_XDG_CONFIG_DIRS))
 
 
 def _get_written_json(mock_obj):
-    """Return the JSON that has been written to a mock `open` object."""
-    # json.dump() calls write() for each individual JSON token.
-    return json.loads(''.join(
-        tuple(call_obj)[1][0]
-        for call_obj
-        in mock_obj().write.mock_calls
-    ))
+    """Return the JSON that has been written to a mock `open` object.
+
+    The JSON document is expected to be serialized up front and written in a
+    single ``write()`` call, as ``uplink settings create`` does.
+    """
+    return json.loads(mock_obj().write.call_args[0][0])
@@ -0,0 +1,69 @@
+# coding=utf-8
+"""Unit tests for :mod:`uplink.exceptions`."""
+import pickle
+import unittest
+
+from uplink import exceptions
+
+
+class CalledProcessErrorTestCase(unittest.TestCase):
+    """Test :class:`uplink.exceptions.CalledProcessError`."""
+
+    def setUp(self):
+        """Create an error for a failed command."""
+        super().setUp()
+        self.args = (('ls', '/nope'), 2, '', 'No such file or directory')
+        self.error = exceptions.CalledProcessError(*self.args)
+
+    def test_str(self):
+        """``str()`` describes the command, return code and outputs."""
+        self.assertEqual(
+            str(self.error),
+            "Command ('ls', '/nope') returned non-zero exit status 2.\n\n"
+            'stdout: \n\n'
+            'stderr: No such file or directory',
+        )
+
+    def test_args(self):
+        """``args`` holds the arguments the error was created with."""
+        self.assertEqual(self.error.args, self.args)
+
+    def test_pickle(self):
+        """The error survives a pickle round trip."""
+        error = pickle.loads(pickle.dumps(self.error))
+        self.assertEqual(error.args, self.args)
+        self.assertEqual(str(error), str(self.error))
+
+    def test_missing_args(self):
+        """The command, return code and both outputs are required."""
+        with self.assertRaises(TypeError):
+            exceptions.CalledProcessError(('ls',), 2)
+
+
+class ConfigValidationErrorTestCase(unittest.TestCase):
+    """Test :class:`uplink.exceptions.ConfigValidationError`."""
+
+    def setUp(self):
+        """Create an error with two validation messages."""
+        super().setUp()
+        self.messages = ['First message.', 'Second message.']
+        self.error = exceptions.ConfigValidationError(self.messages)
+
+    def test_str(self):
+        """``str()`` lists the validation messages, one per line."""
+        self.assertEqual(
+            str(self.error),
+            'Configuration file is not valid:\n\n'
+            'First message.\nSecond message.',
+        )
+
+    def test_args(self):
+        """``args`` and ``error_messages`` hold the validation messages."""
+        self.assertEqual(self.error.args, (self.messages,))
+        self.assertEqual(self.error.error_messages, self.messages)
+
+    def test_pickle(self):
+        """The error survives a pickle round trip."""
+        error = pickle.loads(pickle.dumps(self.error))
+        self.assertEqual(error.error_messages, self.messages)
+        self.assertEqual(str(error), str(self.error))
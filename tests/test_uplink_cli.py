@@ -1,5 +1,6 @@
 # coding=utf-8
 """Unit tests for :mod:`uplink.uplink_cli`."""
+import copy
 import json
 import os
 import unittest
@@ -8,7 +9,10 @@ from unittest import mock
 from click.testing import CliRunner
 from uplink import exceptions, uplink_cli
 
-from .test_config import UPLINK_CONFIG
+from .test_config import UPLINK_CONFIG, UPLINK_CONFIG_DICT
+
+# What `uplink settings show` is expected to output for UPLINK_CONFIG.
+UPLINK_CONFIG_SHOWN = json.dumps(UPLINK_CONFIG_DICT, indent=2, sort_keys=True)
 
 
 class BasePulpSmashCliTestCase(unittest.TestCase):
@@ -30,34 +34,48 @@ class MissingSettingsFileMixin(object):
 
     def test_missing_settings_file(self):
         """Ensure show outputs proper settings file."""
-        with self.cli_runner.isolated_filesystem():
-            with mock.patch.object(uplink_cli, 'UplinkConfig') as psc:
-                cfg = mock.MagicMock()
-                psc.return_value = cfg
-                cfg.get_config_file_path.side_effect = (
-                    exceptions.ConfigFileNotFoundError('No config file found.')
-                )
-                result = self.cli_runner.invoke(
-                    uplink_cli.settings,
-                    [self.settings_subcommand],
-                )
-            self.assertNotEqual(result.exit_code, 0)
-            self.assertIn(
-                'there is no settings file. Use `uplink settings create` '
-                'to create one.',
-                result.output,
+        # UplinkConfig is mocked and nothing is written, so there is no need
+        # for an isolated filesystem.
+        with mock.patch.object(uplink_cli, 'UplinkConfig') as psc:
+            cfg = mock.MagicMock()
+            psc.return_value = cfg
+            cfg.get_config_file_path.side_effect = (
+                exceptions.ConfigFileNotFoundError('No config file found.')
             )
+            result = self.cli_runner.invoke(
+                uplink_cli.settings,
+                [self.settings_subcommand],
+            )
+        self.assertNotEqual(result.exit_code, 0)
+        self.assertIn(
+            'there is no settings file. Use `uplink settings create` '
+            'to create one.',
+            result.output,
+        )
 
 
 class SettingsCreateTestCase(BasePulpSmashCliTestCase):
     """Test ``uplink.uplink_cli.settings_create`` command."""
 
+    @classmethod
+    def setUpClass(cls):
+        """Replace ``UplinkConfig`` for every test."""
+        super().setUpClass()
+        cls._patcher = mock.patch.object(uplink_cli, 'UplinkConfig')
+        cls.psc = cls._patcher.start()
+
+    @classmethod
+    def tearDownClass(cls):
+        """Restore ``UplinkConfig``."""
+        cls._patcher.stop()
+        super().tearDownClass()
+
     def setUp(self):
         """Generate a default expected config dict."""
         super().setUp()
         self.expected_config_dict = {
             'pulp': {
-                'auth': ['admin', 'admin'],
+                'auth': ['admin', 'changeme'],
                 'version': '2.13',
             },
             'systems': [{
@@ -89,22 +107,26 @@ class SettingsCreateTestCase(BasePulpSmashCliTestCase):
             :obj:`uplink.exceptions.ConfigFileNotFoundError`.
         :return: the generated settings.json as string
         """
+        cfg = mock.MagicMock()
+        self.psc.return_value = cfg
+        if cfp_return_value is None:
+            cfg.get_config_file_path.side_effect = (
+                exceptions.ConfigFileNotFoundError('Config not found.')
+            )
+        else:
+            cfg.get_config_file_path.return_value = cfp_return_value
+        cfg.default_config_file_path = 'settings.json'
         with self.cli_runner.isolated_filesystem():
-            with mock.patch.object(uplink_cli, 'UplinkConfig') as psc:
-                cfg = mock.MagicMock()
-                psc.return_value = cfg
-                if cfp_return_value is None:
-                    cfg.get_config_file_path.side_effect = (
-                        exceptions.ConfigFileNotFoundError('Config not found.')
-                    )
-                else:
-                    cfg.get_config_file_path.return_value = cfp_return_value
-                cfg.default_config_file_path = 'settings.json'
-                result = self.cli_runner.invoke(
-                    uplink_cli.settings,
-                    ['create'],
-                    input=create_input
-                )
+            if cfp_return_value is not None:
+                # Overwriting must also restrict a readable settings file.
+                with open(cfp_return_value, 'w') as handler:
+                    handler.write('{}')
+                os.chmod(cfp_return_value, 0o644)
+            result = self.cli_runner.invoke(
+                uplink_cli.settings,
+                ['create'],
+                input=create_input
+            )
             self.assertEqual(result.exit_code, 0)
             self.assertIn(
                 'Creating the settings file at settings.json...\nSettings '
@@ -113,6 +135,10 @@ class SettingsCreateTestCase(BasePulpSmashCliTestCase):
                 result.output,
             )
             self.assertTrue(os.path.isfile('settings.json'))
+            # The temporary file has been moved over the settings file.
+            self.assertEqual(os.listdir('.'), ['settings.json'])
+            # Only the owner may access the file, as it holds credentials.
+            self.assertEqual(os.stat('settings.json').st_mode & 0o077, 0)
             with open('settings.json') as handler:
                 return handler.read()
 
@@ -127,6 +153,7 @@ class SettingsCreateTestCase(BasePulpSmashCliTestCase):
             '\n'  # verify HTTPS
             '\n'  # using qpidd
             '\n'  # running on Pulp system
+            '\n'  # SSH username
         )
         generated_settings = self._test_common_logic(create_input)
         self.assertEqual(
@@ -144,12 +171,50 @@ class SettingsCreateTestCase(BasePulpSmashCliTestCase):
             '\n'  # verify HTTPS
             '\n'  # using qpidd
             '\n'  # running on Pulp system
+            '\n'  # SSH username
         )
         generated_settings = self._test_common_logic(
             create_input, 'settings.json')
         self.assertEqual(
             json.loads(generated_settings), self.expected_config_dict)
 
+    def test_settings_symlink(self):
+        """Create settings file through a symlink to an existing one."""
+        create_input = (
+            'y\n'  # settings exists, continue
+            '\n'  # admin username
+            '\n'  # admin password
+            '2.13\n'  # pulp version
+            'pulp.example.com\n'  # system hostname
+            '\n'  # published via HTTP
+            '\n'  # verify HTTPS
+            '\n'  # using qpidd
+            '\n'  # running on Pulp system
+            '\n'  # SSH username
+        )
+        cfg = mock.MagicMock()
+        self.psc.return_value = cfg
+        cfg.get_config_file_path.return_value = 'settings.json'
+        cfg.default_config_file_path = 'settings.json'
+        with self.cli_runner.isolated_filesystem():
+            os.mkdir('target')
+            target = os.path.join('target', 'settings.json')
+            with open(target, 'w') as handler:
+                handler.write('{}')
+            os.symlink(target, 'settings.json')
+            result = self.cli_runner.invoke(
+                uplink_cli.settings,
+                ['create'],
+                input=create_input
+            )
+            self.assertEqual(result.exit_code, 0)
+            self.assertTrue(os.path.islink('settings.json'))
+            self.assertEqual(os.listdir('target'), ['settings.json'])
+            self.assertEqual(os.stat(target).st_mode & 0o077, 0)
+            with open(target) as handler:
+                self.assertEqual(
+                    json.load(handler), self.expected_config_dict)
+
     def test_create_defaults_and_verify(self):
         """Create settings file with defaults and custom SSL certificate."""
         create_input = (
@@ -162,6 +227,7 @@ class SettingsCreateTestCase(BasePulpSmashCliTestCase):
             '/path/to/ssl/certificate\n'  # SSL certificate path
             '\n'  # using qpidd
             '\n'  # running on Pulp system
+            '\n'  # SSH username
         )
         generated_settings = self._test_common_logic(create_input)
         self.expected_config_dict['systems'][0]['roles']['api']['verify'] = (
@@ -214,11 +280,7 @@ class SettingsShowTestCase(BasePulpSmashCliTestCase, MissingSettingsFileMixin):
                 'Showing settings file settings.json',
                 result.output,
             )
-            self.assertIn(
-                json.dumps(
-                    json.loads(UPLINK_CONFIG), indent=2, sort_keys=True),
-                result.output,
-            )
+            self.assertIn(UPLINK_CONFIG_SHOWN, result.output)
 
 
 class SettingsValidateTestCase(
@@ -270,3 +332,32 @@ class SettingsValidateTestCase(
                 'required property.',
                 result.output,
             )
+
+    def test_invalid_config_messages(self):
+        """Ensure validate shows each validation error on its own line."""
+        config_dict = copy.deepcopy(UPLINK_CONFIG_DICT)
+        del config_dict['pulp']['auth']
+        config_dict['pulp']['version'] = 2
+        with self.cli_runner.isolated_filesystem():
+            with open('settings.json', 'w') as handler:
+                json.dump(config_dict, handler)
+            with mock.patch.object(uplink_cli, 'UplinkConfig') as psc:
+                cfg = mock.MagicMock()
+                psc.return_value = cfg
+                cfg.get_config_file_path.return_value = 'settings.json'
+                result = self.cli_runner.invoke(
+                    uplink_cli.settings,
+                    ['validate'],
+                )
+            self.assertNotEqual(result.exit_code, 0)
+            lines = result.output.splitlines()
+            self.assertIn(
+                "Failed to validate config['pulp'] because 'auth' is a "
+                'required property.',
+                lines,
+            )
+            self.assertIn(
+                "Failed to validate config['pulp']['version'] because 2 is "
+                "not of type 'string'.",
+                lines,
+            )
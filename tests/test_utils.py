@@ -0,0 +1,262 @@
+# coding=utf-8
+"""Unit tests for :mod:`uplink.utils`."""
+import collections
+import http.client
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import requests
+import urllib3
+
+from uplink import utils
+
+try:
+    import requests_cache
+except ImportError:  # pragma: no cover
+    requests_cache = None  # pylint:disable=invalid-name
+
+
+def _response(content, headers=None):
+    """Return a mock response with the given ``content`` and ``headers``."""
+    response = mock.Mock()
+    response.content = content
+    response.headers = {} if headers is None else headers
+    return response
+
+
+class HttpGetCacheTestCase(unittest.TestCase):
+    """Test the response cache of :func:`uplink.utils.http_get`."""
+
+    # pylint:disable=protected-access
+
+    def setUp(self):
+        """Give each test an empty, 10 bytes cache and a mock session."""
+        super().setUp()
+        patchers = [
+            mock.patch.object(
+                utils, '_HTTP_GET_CACHE', collections.OrderedDict()),
+            mock.patch.object(utils, '_HTTP_GET_CACHE_BYTES', 0),
+            mock.patch.object(utils, '_HTTP_GET_CACHE_MAX_BYTES', 10),
+            mock.patch.object(utils, '_get_session'),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        self.get = utils._get_session.return_value.get
+
+    def test_cached(self):
+        """A second request for the same URL does not hit the network."""
+        self.get.return_value = _response(b'1234')
+        for _ in range(2):
+            self.assertEqual(utils.http_get('http://a'), b'1234')
+        self.assertEqual(self.get.call_count, 1)
+
+    def test_evicts_least_recently_used(self):
+        """Old contents are evicted to keep the cache under its size."""
+        self.get.side_effect = lambda url, **kwargs: _response(b'1234')
+        utils.http_get('http://a')
+        utils.http_get('http://b')
+        utils.http_get('http://a')  # Make b the least recently used.
+        utils.http_get('http://c')
+        self.assertEqual(
+            [key[0] for key in utils._HTTP_GET_CACHE],
+            ['http://a', 'http://c'],
+        )
+        self.assertEqual(utils._HTTP_GET_CACHE_BYTES, 8)
+
+    def test_oversized(self):
+        """Contents larger than the whole cache are not cached."""
+        self.get.return_value = _response(b'12345678901')
+        for _ in range(2):
+            utils.http_get('http://a')
+        self.assertEqual(self.get.call_count, 2)
+        self.assertEqual(utils._HTTP_GET_CACHE_BYTES, 0)
+
+    def test_unhashable_kwargs(self):
+        """Requests with unhashable kwargs are sent but not cached."""
+        self.get.return_value = _response(b'1234')
+        for _ in range(2):
+            self.assertEqual(
+                utils.http_get('http://a', params={'q': 'x'}), b'1234')
+        self.assertEqual(self.get.call_count, 2)
+        self.get.assert_called_with('http://a', params={'q': 'x'})
+
+    def test_not_cacheable(self):
+        """Responses which forbid caching are not cached."""
+        for cache_control in ('private, no-store', 'no-cache', 'max-age=0'):
+            with self.subTest(cache_control=cache_control):
+                self.get.reset_mock()
+                self.get.return_value = _response(
+                    b'1234', {'Cache-Control': cache_control})
+                for _ in range(2):
+                    utils.http_get('http://a')
+                self.assertEqual(self.get.call_count, 2)
+
+    def test_expires(self):
+        """Cached contents are fetched again once they expire."""
+        self.get.side_effect = (_response(b'1234'), _response(b'5678'))
+        with mock.patch.object(utils.time, 'monotonic') as monotonic:
+            monotonic.return_value = 0
+            self.assertEqual(utils.http_get('http://a'), b'1234')
+            monotonic.return_value = utils._HTTP_GET_CACHE_TTL - 1
+            self.assertEqual(utils.http_get('http://a'), b'1234')
+            monotonic.return_value = utils._HTTP_GET_CACHE_TTL
+            self.assertEqual(utils.http_get('http://a'), b'5678')
+        self.assertEqual(self.get.call_count, 2)
+        self.assertEqual(utils._HTTP_GET_CACHE_BYTES, 4)
+
+    def test_max_age(self):
+        """A ``max-age`` shorter than the cache's own expiry is obeyed."""
+        self.get.return_value = _response(
+            b'1234', {'Cache-Control': 'public, max-age=60'})
+        with mock.patch.object(utils.time, 'monotonic') as monotonic:
+            monotonic.return_value = 0
+            utils.http_get('http://a')
+            monotonic.return_value = 59
+            utils.http_get('http://a')
+            self.assertEqual(self.get.call_count, 1)
+            monotonic.return_value = 60
+            utils.http_get('http://a')
+        self.assertEqual(self.get.call_count, 2)
+
+
+def _send(adapter, request, **kwargs):  # pylint:disable=unused-argument
+    """Answer ``request`` like a server which requires authentication."""
+    if 'Authorization' in request.headers:
+        status, content = 200, b'secret'
+    else:
+        status, content = 401, b''
+    raw = urllib3.HTTPResponse(
+        body=io.BytesIO(content),
+        status=status,
+        preload_content=False,
+        request_url=request.url,
+    )
+    return adapter.build_response(request, raw)
+
+
+def _send_cookie(adapter, request, **kwargs):  # pylint:disable=W0613
+    """Answer ``request`` with a cookie, echoing any cookie it carries."""
+    content = request.headers.get('Cookie', '').encode()
+    raw = urllib3.HTTPResponse(
+        body=io.BytesIO(content),
+        status=200,
+        preload_content=False,
+        request_url=request.url,
+        original_response=mock.Mock(msg=http.client.parse_headers(
+            io.BytesIO(b'Set-Cookie: session=1; Path=/\r\n\r\n'))),
+    )
+    return adapter.build_response(request, raw)
+
+
+class GetSessionTestCase(unittest.TestCase):
+    """Test :func:`uplink.utils._get_session`."""
+
+    def setUp(self):
+        """Make ``_get_session`` create a new session in a temporary dir."""
+        super().setUp()
+        tmp_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp_dir.cleanup)
+        self.cache_dir = os.path.join(tmp_dir.name, 'uplink')
+        os.mkdir(self.cache_dir, 0o755)
+        patchers = [
+            mock.patch.object(utils, '_SESSION', None),
+            mock.patch.object(
+                utils.BaseDirectory,
+                'save_cache_path',
+                return_value=self.cache_dir,
+            ),
+        ]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    @unittest.skipIf(requests_cache is None, 'requests-cache is not installed')
+    def test_cache_control(self):
+        """The requests-cache session obeys ``Cache-Control`` headers."""
+        with mock.patch.object(requests_cache, 'CachedSession') as session:
+            utils._get_session()  # pylint:disable=protected-access
+        self.assertIs(session.call_args[1]['cache_control'], True)
+
+    @unittest.skipIf(requests_cache is None, 'requests-cache is not installed')
+    def test_permissions(self):
+        """Only the owner may access the requests-cache database."""
+        session = utils._get_session()  # pylint:disable=protected-access
+        self.addCleanup(session.close)
+        self.assertEqual(os.stat(self.cache_dir).st_mode & 0o777, 0o700)
+        cache_path = os.path.join(self.cache_dir, 'http.sqlite')
+        self.assertEqual(os.stat(cache_path).st_mode & 0o777, 0o600)
+
+    @unittest.skipIf(requests_cache is None, 'requests-cache is not installed')
+    def test_auth_not_shared(self):
+        """An authenticated response is not served to an anonymous request."""
+        session = utils._get_session()  # pylint:disable=protected-access
+        self.addCleanup(session.close)
+        with mock.patch.object(requests.adapters.HTTPAdapter, 'send', _send):
+            self.assertEqual(
+                utils.http_get('http://a', auth=('u', 'p')), b'secret')
+            # Only the database is shared with other processes.
+            with mock.patch.object(
+                    utils, '_HTTP_GET_CACHE', collections.OrderedDict()):
+                with self.assertRaises(requests.exceptions.HTTPError):
+                    utils.http_get('http://a')
+        self.assertEqual(session.cache.responses.keys(), set())
+
+    def test_no_cookies(self):
+        """Cookies set by one response are not sent with later requests."""
+        session = utils._get_session()  # pylint:disable=protected-access
+        self.addCleanup(session.close)
+        with mock.patch.object(
+                requests.adapters.HTTPAdapter, 'send', _send_cookie):
+            utils.http_get('http://a/1')
+            self.assertEqual(utils.http_get('http://a/2'), b'')
+        self.assertEqual(len(session.cookies), 0)
+
+    @unittest.skipIf(requests_cache is None, 'requests-cache is not installed')
+    def test_streamed_downloads_not_cached(self):
+        """Downloads to ``dest`` bypass the requests-cache session."""
+        session = mock.MagicMock(spec=requests_cache.CachedSession)
+        with mock.patch.object(utils, '_get_session', return_value=session):
+            utils.http_get('http://a', dest=io.BytesIO())
+        session.cache_disabled.assert_called_once_with()
+        session.get.assert_called_once_with('http://a', stream=True)
+
+
+class HttpGetToFileTestCase(unittest.TestCase):
+    """Test :func:`uplink.utils.http_get` with a ``dest``."""
+
+    def setUp(self):
+        """Give each test a mock session."""
+        super().setUp()
+        patcher = mock.patch.object(utils, '_get_session')
+        self.session = patcher.start().return_value
+        self.addCleanup(patcher.stop)
+        self.response = self.session.get.return_value.__enter__.return_value
+
+    def test_chunks_written(self):
+        """The response is written to ``dest`` a chunk at a time."""
+        self.response.iter_content.return_value = [b'123', b'45']
+        dest = io.BytesIO()
+        written = utils.http_get('http://a', dest=dest, chunk_size=3)
+        self.assertEqual(written, 5)
+        self.assertEqual(dest.getvalue(), b'12345')
+        self.response.iter_content.assert_called_once_with(3)
+        self.session.get.assert_called_once_with('http://a', stream=True)
+
+    def test_raise_for_status(self):
+        """Nothing is written to ``dest`` if the request fails."""
+        self.response.raise_for_status.side_effect = (
+            requests.exceptions.HTTPError())
+        dest = io.BytesIO()
+        with self.assertRaises(requests.exceptions.HTTPError):
+            utils.http_get('http://a', dest=dest)
+        self.assertEqual(dest.getvalue(), b'')
+
+    def test_stream(self):
+        """``stream`` cannot be given together with ``dest``."""
+        with self.assertRaises(TypeError):
+            utils.http_get('http://a', dest=io.BytesIO(), stream=False)
+        self.assertEqual(self.session.get.call_count, 0)
@@ -8,18 +8,24 @@ with that server. :class:`uplink.config.UplinkConfig` eases the task of
 managing that information.
 """
 import collections
+import functools
 import itertools
 import json
 import os
+import re
 import warnings
 from copy import deepcopy
 
-import jsonschema
 from packaging.version import Version
 from xdg import BaseDirectory
 
 from uplink import exceptions
 
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None  # pylint:disable=invalid-name
+
 
 # `get_config` uses this as a cache. It is intentionally a global. This design
 # lets us do interesting things like flush the cache at run time or completely
@@ -49,6 +55,18 @@ ROLES = REQUIRED_ROLES.union(OPTIONAL_ROLES)
 AMQP_SERVICES = {'qpidd', 'rabbitmq'}
 """Set of expected amqp services."""
 
+# `UplinkConfig.services_for_roles` uses this to map roles to the services
+# they run. The 'amqp broker' role is missing because its service depends on
+# the role's configuration.
+_ROLE_SERVICES = {
+    'api': 'httpd',
+    'mongod': 'mongod',
+    'pulp celerybeat': 'pulp_celerybeat',
+    'pulp resource manager': 'pulp_resource_manager',
+    'pulp workers': 'pulp_workers',
+    'squid': 'squid',
+}
+
 # Config file JSON schema
 CONFIG_JSON_SCHEMA = {
     'type': 'object',
@@ -139,13 +157,53 @@ CONFIG_JSON_SCHEMA = {
     },
 }
 
+# `validate_config` uses this as a cache. Importing jsonschema and building
+# the validator are far more expensive than validating a config, so they are
+# done once, the first time a config is validated.
+_VALIDATOR = None
+
+_HOSTNAME_RE = re.compile(
+    r'(?=.{1,253}\Z)'
+    r'[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?'
+    r'(?:\.[A-Za-z0-9](?:[A-Za-z0-9-]{0,61}[A-Za-z0-9])?)*'
+)
+
+# `validate_config` uses this as a cache. Its keys are the `_config_key` of
+# configs which passed validation, least recently used first. Only valid
+# configs are cached, so invalid configs always get a full list of error
+# messages.
+_VALID_CONFIGS = collections.OrderedDict()
+_VALID_CONFIGS_MAXSIZE = 128
+
 
 def _public_attrs(obj):
-    """Return a copy of the public elements in ``vars(obj)``."""
-    return {
-        key: val for key, val in vars(obj).copy().items()
-        if not key.startswith('_')
-    }
+    """Return a dict of the attributes named in ``obj._PUBLIC_ATTRS``."""
+    # pylint:disable=protected-access
+    return {key: getattr(obj, key) for key in obj._PUBLIC_ATTRS}
+
+
+def _json_loads(data):
+    """Deserialize ``data``, a UTF-8 encoded JSON document.
+
+    ``orjson`` is used if it is installed, otherwise :mod:`json` is used.
+    """
+    if orjson is None:
+        # json.loads only accepts bytes from Python 3.6 on.
+        return json.loads(data.decode('utf-8'))
+    return orjson.loads(data)
+
+
+def _json_dumps(obj):
+    """Serialize ``obj`` to indented, UTF-8 encoded JSON with sorted keys.
+
+    ``orjson`` is used if it is installed, otherwise :mod:`json` is used.
+    Either way, non-ASCII characters are written as UTF-8, not escaped.
+    """
+    if orjson is None:
+        return json.dumps(
+            obj, ensure_ascii=False, indent=2, sort_keys=True).encode('utf-8')
+    return orjson.dumps(
+        obj, option=orjson.OPT_INDENT_2 | orjson.OPT_SORT_KEYS)
 
 
 def get_config():
@@ -164,6 +222,36 @@ def get_config():
     return deepcopy(_CONFIG)
 
 
+def _get_validator():
+    """Return the validator for ``CONFIG_JSON_SCHEMA``, building it if needed.
+
+    :returns: A jsonschema validator which checks formats, using
+        :func:`_is_hostname` for the ``hostname`` format.
+    """
+    global _VALIDATOR  # pylint:disable=global-statement
+    if _VALIDATOR is None:
+        import jsonschema  # pylint:disable=import-outside-toplevel
+        format_checker = jsonschema.FormatChecker()
+        format_checker.checks('hostname')(_is_hostname)
+        validator_cls = jsonschema.validators.validator_for(CONFIG_JSON_SCHEMA)
+        validator_cls.check_schema(CONFIG_JSON_SCHEMA)
+        _VALIDATOR = validator_cls(
+            schema=CONFIG_JSON_SCHEMA, format_checker=format_checker)
+    return _VALIDATOR
+
+
+def _is_hostname(instance):
+    """Tell whether ``instance`` is a valid hostname.
+
+    jsonschema only checks the ``hostname`` format if the optional ``fqdn``
+    package is installed, so Uplink always uses its own check instead.
+    Non-strings are left to the ``type`` keyword of the schema.
+    """
+    if not isinstance(instance, str):
+        return True
+    return _HOSTNAME_RE.fullmatch(instance) is not None
+
+
 def validate_config(config_dict):
     """Validate the config file schema.
 
@@ -172,30 +260,29 @@ def validate_config(config_dict):
     :raises uplink.exceptions.ConfigValidationError: If the any validation
         error is found.
     """
-    validator_cls = jsonschema.validators.validator_for(CONFIG_JSON_SCHEMA)
-    validator = validator_cls(
-        schema=CONFIG_JSON_SCHEMA, format_checker=jsonschema.FormatChecker())
-    validator.check_schema(CONFIG_JSON_SCHEMA)
-    messages = []
+    key = _config_key(config_dict)
+    if key is not None and key in _VALID_CONFIGS:
+        _VALID_CONFIGS.move_to_end(key)
+        return
 
-    if not validator.is_valid(config_dict):
-        for error in validator.iter_errors(config_dict):
-            # jsonschema returns messages where the first letter is uppercase,
-            # make sure to lower the first letter case to fit better on our
-            # message.
-            error_message = error.message[:1].lower() + error.message[1:]
-            if error.relative_path:
-                config_path = '[{}]'.format(
-                    ']['.join([repr(i) for i in error.relative_path])
-                )
-            else:
-                config_path = ''
-            messages.append(
-                'Failed to validate config{} because {}.'.format(
-                    config_path,
-                    error_message,
-                )
+    messages = []
+    for error in _get_validator().iter_errors(config_dict):
+        # jsonschema returns messages where the first letter is uppercase,
+        # make sure to lower the first letter case to fit better on our
+        # message.
+        error_message = error.message[:1].lower() + error.message[1:]
+        if error.relative_path:
+            config_path = '[{}]'.format(
+                ']['.join([repr(i) for i in error.relative_path])
+            )
+        else:
+            config_path = ''
+        messages.append(
+            'Failed to validate config{} because {}.'.format(
+                config_path,
+                error_message,
             )
+        )
     if messages:
         raise exceptions.ConfigValidationError(messages)
 
@@ -210,9 +297,50 @@ def validate_config(config_dict):
             )
         ])
 
+    if key is not None:
+        _VALID_CONFIGS[key] = None
+        if len(_VALID_CONFIGS) > _VALID_CONFIGS_MAXSIZE:
+            _VALID_CONFIGS.popitem(last=False)
+
+
+def _config_key(config_dict):
+    """Return a hashable form of ``config_dict`` for use as a cache key.
+
+    The type of every value is part of the key. ``json.dumps``, for example,
+    serializes a tuple like a list, but jsonschema rejects a tuple where the
+    schema asks for an ``array``.
+
+    :returns: A tuple, or ``None`` if ``config_dict`` cannot be made hashable.
+    """
+    try:
+        key = _freeze(config_dict)
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _freeze(value):
+    """Recursively convert ``value`` into nested tuples tagged with types."""
+    if isinstance(value, dict):
+        return (type(value), tuple(sorted(
+            (key, _freeze(item)) for key, item in value.items())))
+    if isinstance(value, (list, tuple)):
+        return (type(value), tuple(_freeze(item) for item in value))
+    return (type(value), value)
 
-# Representation of a system and its roles."""
-PulpSystem = collections.namedtuple('PulpSystem', 'hostname roles')
+
+class PulpSystem(collections.namedtuple('PulpSystem', 'hostname roles')):
+    """Representation of a system and its roles.
+
+    ``roles`` is a dict, which would make the default tuple hash fail. Hash the
+    hostname and the role names instead, so systems can be put in sets.
+    """
+
+    __slots__ = ()
+
+    def __hash__(self):  # noqa
+        return hash((self.hostname, frozenset(self.roles)))
 
 
 class UplinkConfig(object):
@@ -273,6 +401,16 @@ class UplinkConfig(object):
     .. _packaging: https://packaging.pypa.io/en/latest/
     """
 
+    __slots__ = (
+        'pulp_auth',
+        'pulp_version',
+        'systems',
+        '_xdg_config_file',
+        '_xdg_config_dir',
+    )
+
+    _PUBLIC_ATTRS = ('pulp_auth', 'pulp_version', 'systems')
+
     def __init__(self, pulp_auth=None, pulp_version=None, systems=None):
         """Initialize this object with needed instance attributes."""
         self.pulp_auth = pulp_auth
@@ -330,8 +468,8 @@ class UplinkConfig(object):
         if xdg_config_dir is None:
             xdg_config_dir = self._xdg_config_dir
         path = self.get_config_file_path()
-        with open(path) as handle:
-            config_file = json.load(handle)
+        with open(path, 'rb') as handle:
+            config_file = _json_loads(handle.read())
 
         if 'systems' not in config_file:
             # We could use textwrap.wrap() on the message, but that makes log
@@ -373,25 +511,13 @@ class UplinkConfig(object):
     @staticmethod
     def services_for_roles(roles):
         """Return the services based on the roles."""
-        services = []
-        for role in roles:
-            if role == 'amqp broker':
-                service = roles[role].get('service')
-                if service in AMQP_SERVICES:
-                    services.append(service)
-            elif role == 'api':
-                services.append('httpd')
-            elif role in (
-                    'pulp celerybeat',
-                    'pulp resource manager',
-                    'pulp workers',
-            ):
-                services.append(role.replace(' ', '_'))
-            elif role in ('mongod', 'squid'):
-                services.append(role)
-            else:
-                continue
-        return set(services)
+        services = {
+            _ROLE_SERVICES[role] for role in roles if role in _ROLE_SERVICES}
+        if 'amqp broker' in roles:
+            service = roles['amqp broker'].get('service')
+            if service in AMQP_SERVICES:
+                services.add(service)
+        return services
 
     @property
     def base_url(self):
@@ -461,6 +587,7 @@ class UplinkConfig(object):
         return kwargs
 
 
+@functools.lru_cache(maxsize=16)
 def _get_config_file_path(xdg_config_dir, xdg_config_file):
     """Search ``XDG_CONFIG_DIRS`` for a config file and return the first found.
 
@@ -469,6 +596,10 @@ def _get_config_file_path(xdg_config_dir, xdg_config_file):
     that by the time client code attempts to open the file, it may be gone or
     otherwise inaccessible.
 
+    Found paths are cached, so later calls do not search the file system
+    again. Call ``_get_config_file_path.cache_clear()`` after creating or
+    removing a configuration file. Failed searches are not cached.
+
     :param xdg_config_dir: A string. The name of the directory that is suffixed
         to the end of each of the ``XDG_CONFIG_DIRS`` paths.
     :param xdg_config_file: A string. The name of the configuration file that
@@ -477,13 +608,14 @@ def _get_config_file_path(xdg_config_dir, xdg_config_file):
     :raises uplink.exceptions.ConfigFileNotFoundError: If the requested
         configuration file cannot be found.
     """
-    path = BaseDirectory.load_first_config(xdg_config_dir, xdg_config_file)
-    if path and os.path.isfile(path):
-        return path
+    paths = [
+        os.path.join(config_dir, xdg_config_dir, xdg_config_file)
+        for config_dir in BaseDirectory.xdg_config_dirs
+    ]
+    for path in paths:
+        if os.path.isfile(path):
+            return path
     raise exceptions.ConfigFileNotFoundError(
         'Uplink is unable to find a configuration file. The following '
-        '(XDG compliant) paths have been searched: ' + ', '.join([
-            os.path.join(config_dir, xdg_config_dir, xdg_config_file)
-            for config_dir in BaseDirectory.xdg_config_dirs
-        ])
+        '(XDG compliant) paths have been searched: ' + ', '.join(paths)
     )
@@ -36,13 +36,18 @@ class CalledProcessError(Exception):
     See :meth:`uplink.cli.CompletedProcess` for more information.
     """
 
-    def __str__(self):
-        """Provide a human-friendly string representation of this exception."""
-        return (
+    def __init__(self, cmd, returncode, stdout, stderr, *args, **kwargs):
+        """Require the command, its return code and its outputs."""
+        super().__init__(cmd, returncode, stdout, stderr, *args, **kwargs)
+        self._str = (
             'Command {} returned non-zero exit status {}.\n\n'
             'stdout: {}\n\n'
             'stderr: {}'
-        ).format(*self.args)
+        ).format(cmd, returncode, stdout, stderr)
+
+    def __str__(self):
+        """Provide a human-friendly string representation of this exception."""
+        return self._str
 
 
 class ConfigFileNotFoundError(Exception):
@@ -64,13 +69,14 @@ class ConfigValidationError(Exception):
         """Require that the validation messages list is defined."""
         super().__init__(error_messages, *args, **kwargs)
         self.error_messages = error_messages
+        self._str = (
+            'Configuration file is not valid:\n\n'
+            '{}'
+        ).format('\n'.join(error_messages))
 
     def __str__(self):
         """Provide a human-friendly string representation of this exception."""
-        return (
-            'Configuration file is not valid:\n\n'
-            '{}'
-        ).format('\n'.join(self.error_messages))
+        return self._str
 
 
 class ConfigFileSectionNotFoundError(Exception):
@@ -1,11 +1,24 @@
 # coding=utf-8
 """The entry point for Uplink's command line interface."""
 import json
+import os
+import tempfile
 
 import click
 
 from uplink import config, exceptions
-from uplink.config import UplinkConfig
+from uplink.config import UplinkConfig, _json_dumps, _json_loads
+
+# The roles that `settings_create` gives a system whatever the user answers.
+# Each of them has an empty configuration.
+_STATIC_ROLE_NAMES = (
+    'mongod',
+    'pulp celerybeat',
+    'pulp cli',
+    'pulp resource manager',
+    'pulp workers',
+    'squid',
+)
 
 
 def _raise_settings_not_found():
@@ -100,23 +113,34 @@ def settings_create(ctx):
         'systems': [{
             'hostname': system_hostname,
             'roles': {
+                **{role: {} for role in _STATIC_ROLE_NAMES},
                 'amqp broker': {'service': amqp_broker},
                 'api': {
                     'scheme': system_api_scheme,
                     'verify': system_api_verify,
                 },
-                'mongod': {},
-                'pulp celerybeat': {},
-                'pulp cli': {},
-                'pulp resource manager': {},
-                'pulp workers': {},
                 'shell': {'transport': 'ssh' if using_ssh else 'local'},
-                'squid': {},
             }
         }]
     }
-    with open(path, 'w') as handler:
-        handler.write(json.dumps(config_dict, indent=2, sort_keys=True))
+    # The settings file holds credentials, so only its owner may read it.
+    # mkstemp creates the temporary file with mode 0o600. Moving it over
+    # ``path`` once it is synced to disk means an interrupted run leaves
+    # either the old settings file or the new one, never a partial file. If
+    # ``path`` is a symlink, the file it points to is replaced instead.
+    path = os.path.realpath(path)
+    fd, tmp_path = tempfile.mkstemp(
+        dir=os.path.dirname(path), prefix='.settings-')
+    try:
+        with os.fdopen(fd, 'wb') as handler:
+            handler.write(_json_dumps(config_dict))
+            handler.flush()
+            os.fsync(handler.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    config._get_config_file_path.cache_clear()  # pylint:disable=W0212
     click.echo(
         'Settings file created, run `uplink settings show` to show its '
         'contents.'
@@ -135,8 +159,11 @@ def settings_show(ctx):
         'Showing settings file {}\n'
         .format(path)
     )
-    with open(path) as handle:
-        click.echo(json.dumps(json.load(handle), indent=2, sort_keys=True))
+    # The file must be parsed even if it looks formatted already: only
+    # re-serializing it guarantees the indentation and key order shown.
+    with open(path, 'rb') as handle:
+        config_dict = _json_loads(handle.read())
+    click.echo(_json_dumps(config_dict).decode('utf-8'))
 
 
 @settings.command('validate')
@@ -147,8 +174,8 @@ def settings_validate(ctx):
     if not path:
         _raise_settings_not_found()
 
-    with open(path) as handle:
-        config_dict = json.load(handle)
+    with open(path, 'rb') as handle:
+        config_dict = _json_loads(handle.read())
     if 'systems' not in config_dict and 'pulp' in config_dict:
         message = (
             'the settings file at {} appears to be following the old '
@@ -166,8 +193,7 @@ def settings_validate(ctx):
             'invalid settings file {}\n'
             .format(path)
         )
-        for error_message in err.error_messages:
-            message += error_message
+        message += '\n'.join(err.error_messages)
         result = click.ClickException(message)
         result.exit_code = -1
         raise result
@@ -1,28 +1,207 @@
 # coding=utf-8
 """Utility functions for Satellite tests."""
+import collections
+import http.cookiejar
+import os
+import time
 import uuid
 
 import requests
+from xdg import BaseDirectory
 
 
 # A mapping between URLs and SHA 256 checksums. Used by get_sha256_checksum().
 _CHECKSUM_CACHE = {}
 
+# `http_get` uses this as a cache. It maps ``(url, kwargs)`` keys to
+# ``(expires, content)`` pairs, least recently used first. ``expires`` is a
+# `time.monotonic` value. `_cache_http_get` keeps the total size of the cached
+# contents under _HTTP_GET_CACHE_MAX_BYTES.
+_HTTP_GET_CACHE = collections.OrderedDict()
+_HTTP_GET_CACHE_BYTES = 0
+_HTTP_GET_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+# How long, in seconds, `http_get` may reuse a response at most.
+_HTTP_GET_CACHE_TTL = 3600
+
+# `http_get` uses this session. `_get_session` creates it on first use.
+_SESSION = None
+
+# `_session_get` bypasses the requests-cache database for requests with any of
+# these kwargs. They carry credentials, or change what a response may be
+# trusted for, and requests-cache does not include them in its cache keys.
+_UNCACHED_KWARGS = frozenset(('auth', 'cert', 'cookies', 'headers', 'verify'))
+
 
 def uuid4():
     """Return a random UUID, as a unicode string."""
-    return type('')(uuid.uuid4())
+    return str(uuid.uuid4())
 
 
-def http_get(url, **kwargs):
+def http_get(url, *, dest=None, chunk_size=1 << 20, **kwargs):
     """Issue a HTTP request to the ``url`` and return the response content.
 
     This is useful for downloading file contents over HTTP[S].
 
+    Response contents are cached in memory for up to an hour, so requesting
+    the same ``url`` with the same ``kwargs`` again does not hit the network.
+    A shorter ``Cache-Control: max-age`` is obeyed. Requests whose ``kwargs``
+    are not hashable, and responses sent with ``Cache-Control: no-store``,
+    ``no-cache`` or ``max-age=0``, are not cached.
+
+    Large files, such as ISOs, should be downloaded by passing ``dest``. The
+    response is then streamed to ``dest`` in chunks instead of being held in
+    memory, and it is not cached, neither in memory nor on disk.
+
     :param url: the URL where the content should be get.
-    :param kwargs: additional kwargs to be passed to ``requests.get``.
-    :returns: the response content of a GET request to ``url``.
+    :param dest: optionally, a binary file-like object to write the response
+        content to.
+    :param chunk_size: the number of bytes to read at a time when streaming
+        the response content to ``dest``.
+    :param kwargs: additional kwargs to be passed to
+        ``requests.Session.get``.
+    :returns: the response content of a GET request to ``url`` or, if
+        ``dest`` is given, the number of bytes written to it.
+    :raises TypeError: if both ``dest`` and ``stream`` are given.
     """
-    response = requests.get(url, **kwargs)
+    if dest is not None:
+        if 'stream' in kwargs:
+            raise TypeError(
+                'http_get() always streams downloads to dest, so it does not '
+                'accept stream together with dest'
+            )
+        return _http_get_to_file(url, dest, chunk_size, **kwargs)
+    key = (url, tuple(sorted(kwargs.items())))
+    try:
+        entry = _HTTP_GET_CACHE.get(key)
+    except TypeError:
+        key = entry = None
+    if entry is not None:
+        expires, content = entry
+        if time.monotonic() < expires:
+            _HTTP_GET_CACHE.move_to_end(key)
+            return content
+        _uncache_http_get(key)
+    response = _session_get(url, True, **kwargs)
     response.raise_for_status()
+    ttl = _http_get_ttl(response.headers)
+    if key is not None and ttl > 0:
+        _cache_http_get(key, response.content, ttl)
     return response.content
+
+
+def _http_get_to_file(url, dest, chunk_size, **kwargs):
+    """Stream the content of a GET request to ``url`` into ``dest``.
+
+    :returns: the number of bytes written to ``dest``.
+    """
+    written = 0
+    # requests-cache would read the whole response into memory and store it
+    # in its database, which is what streaming to ``dest`` avoids.
+    with _session_get(url, False, stream=True, **kwargs) as response:
+        response.raise_for_status()
+        for chunk in response.iter_content(chunk_size):
+            dest.write(chunk)
+            written += len(chunk)
+    return written
+
+
+def _session_get(url, cache, **kwargs):
+    """Send a GET request to ``url`` with the ``http_get`` session.
+
+    :param cache: whether the response may be read from and written to the
+        requests-cache database, if the session has one. Requests with any
+        of ``_UNCACHED_KWARGS`` never are.
+    :param kwargs: additional kwargs to be passed to
+        ``requests.Session.get``.
+    """
+    session = _get_session()
+    if not hasattr(session, 'cache_disabled') or (
+            cache and _UNCACHED_KWARGS.isdisjoint(kwargs)):
+        return session.get(url, **kwargs)
+    with session.cache_disabled():
+        return session.get(url, **kwargs)
+
+
+def _http_get_ttl(headers):
+    """Return how long ``http_get`` may cache a response, in seconds.
+
+    :param headers: the headers of the response.
+    :returns: at most ``_HTTP_GET_CACHE_TTL``, or 0 if the response must not
+        be cached.
+    """
+    ttl = _HTTP_GET_CACHE_TTL
+    for directive in headers.get('Cache-Control', '').split(','):
+        name, _, value = directive.strip().lower().partition('=')
+        if name in ('no-cache', 'no-store'):
+            return 0
+        if name == 'max-age':
+            try:
+                ttl = min(ttl, int(value.strip('"')))
+            except ValueError:
+                return 0
+    return ttl
+
+
+def _cache_http_get(key, content, ttl):
+    """Add ``content`` to the ``http_get`` cache, evicting old contents."""
+    global _HTTP_GET_CACHE_BYTES  # pylint:disable=global-statement
+    if len(content) > _HTTP_GET_CACHE_MAX_BYTES:
+        return
+    _HTTP_GET_CACHE[key] = (time.monotonic() + ttl, content)
+    _HTTP_GET_CACHE_BYTES += len(content)
+    while _HTTP_GET_CACHE_BYTES > _HTTP_GET_CACHE_MAX_BYTES:
+        _, (_, evicted) = _HTTP_GET_CACHE.popitem(last=False)
+        _HTTP_GET_CACHE_BYTES -= len(evicted)
+
+
+def _uncache_http_get(key):
+    """Remove the contents cached for ``key`` from the ``http_get`` cache."""
+    global _HTTP_GET_CACHE_BYTES  # pylint:disable=global-statement
+    _, content = _HTTP_GET_CACHE.pop(key)
+    _HTTP_GET_CACHE_BYTES -= len(content)
+
+
+def _get_session():
+    """Return the session used by ``http_get``, creating it if needed.
+
+    If `requests-cache`_ is installed, the session also caches responses for
+    an hour in a SQLite database in the XDG cache directory, so they are
+    reused across processes. It obeys ``Cache-Control`` response headers, so
+    ``no-store`` responses are not written to the database. Streamed
+    downloads, and requests with credentials or TLS options, bypass it. The
+    database is only readable by its owner. Otherwise the session is a plain
+    ``requests.Session``.
+
+    Either way, the session keeps connections alive and pools them, so
+    consecutive requests to the same host do not set up a new TCP and TLS
+    connection each time. It does not keep cookies, so one ``http_get`` call
+    never sends cookies that were set during another.
+
+    .. _requests-cache: https://requests-cache.readthedocs.io/
+    """
+    global _SESSION  # pylint:disable=global-statement
+    if _SESSION is None:
+        try:
+            import requests_cache  # pylint:disable=import-outside-toplevel
+        except ImportError:
+            _SESSION = requests.Session()
+        else:
+            cache_dir = BaseDirectory.save_cache_path('uplink')
+            os.chmod(cache_dir, 0o700)
+            cache_path = os.path.join(cache_dir, 'http.sqlite')
+            os.close(os.open(cache_path, os.O_CREAT | os.O_WRONLY, 0o600))
+            os.chmod(cache_path, 0o600)
+            _SESSION = requests_cache.CachedSession(
+                cache_path,
+                backend='sqlite',
+                cache_control=True,
+                expire_after=_HTTP_GET_CACHE_TTL,
+            )
+        _SESSION.cookies.set_policy(
+            http.cookiejar.DefaultCookiePolicy(allowed_domains=()))
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=16, pool_maxsize=32)
+        _SESSION.mount('http://', adapter)
+        _SESSION.mount('https://', adapter)
+    return _SESSION